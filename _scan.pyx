@@ -0,0 +1,43 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+# -*- coding: utf-8 -*-
+"""
+PyShield 扫描加速模块 —— is_valid_module 的 Cython 实现
+
+pyshield.py 在扫描阶段会对项目中的每个 .py 文件调用 is_valid_module，
+编译本模块后自动替换纯 Python 实现，未编译时回退，行为完全一致。
+
+编译方法（在 pyshield.py 所在目录执行）：
+    cythonize -i _scan.pyx
+"""
+
+# 须与 pyshield.py 中的 EXCLUDE_FILES / EXCLUDE_PREFIXES 保持一致
+cdef frozenset EXCLUDE_FILES = frozenset({"setup.py"})
+cdef tuple EXCLUDE_PREFIXES = (".", "_")
+
+
+cpdef bint is_valid_module(
+    str file_name,
+    str rel_path,
+    frozenset exclude_exact,
+    frozenset exclude_wild_basenames,
+):
+    """
+    判断一个 .py 文件是否应该参与 Cython 编译（参数与 pyshield.is_valid_module 相同）。
+    """
+    # 仅处理 .py 文件
+    if not file_name.endswith(".py"):
+        return False
+
+    # 排除固定名称文件（如 setup.py）
+    if file_name in EXCLUDE_FILES:
+        return False
+
+    # 排除隐藏或私有文件（但保留 __init__.py）
+    if file_name.startswith(EXCLUDE_PREFIXES) and file_name != "__init__.py":
+        return False
+
+    # 精确路径排除或通配符排除
+    if rel_path in exclude_exact or file_name in exclude_wild_basenames:
+        return False
+
+    return True
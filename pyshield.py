@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+# cython: language_level=3
 """
 Cython 批量编译工具 —— 将整个 Python 项目编译为 .pyd/.so 文件
 支持排除目录、排除文件、保留非Python资源文件、保留 __init__.py 等
@@ -10,12 +11,23 @@ Cython 批量编译工具 —— 将整个 Python 项目编译为 .pyd/.so 文
 参数说明：
     project_path        项目根目录路径（必须）
     -o, --output        输出目录（默认: build）
-    -t, --threads       并行编译线程数（0=自动检测，默认: 0）
-    --exclude-dir       逗号分隔的目录名，排除编译但保留复制（如: tests,docs）
-    --exclude-py        通配符规则：
+    -t, -j, --threads, --jobs
+                        并行编译线程数（0=自动检测，1=关闭并行编译，默认: 0）
+    -D, --exclude-dir   逗号分隔的目录名，排除编译但保留复制（如: tests,docs）
+    -P, --exclude-py    通配符规则：
                         - 精确路径: "hello/greeter.py" → 只排除 hello/greeter.py
                         - 全局通配: "*greeter.py" → 排除所有目录下的 greeter.py
                         - 非法格式: "*/greeter.py", "utils/*.py" → 直接报错拒绝
+    --force / --no-force
+                        忽略 / 复用增量构建缓存（默认复用；环境变量 CYTHON_FORCE_REGEN=1 等同 --force）
+    --link-excluded     排除目录与输出目录同一文件系统时以硬链接代替复制
+    --onefile           全部模块合并链接为一个共享库，各模块路径为其硬链接（仅 POSIX）
+    --shared-utility    公用的 Cython 运行时代码集中到共享模块（需 Cython 3.1+）
+    --no-native         不针对本机 CPU 优化（-march=native），产物可在其他机器上运行
+    --pgo TRAIN_CMD     剖析引导优化：插桩构建 → 运行训练命令 → 按剖析数据重新构建（仅 POSIX）
+    --tmpfs             临时文件写入 /dev/shm，结束时删除
+    --c-cache DIR       跨构建共享的 .c 缓存目录
+    --annotate          生成 Cython HTML 注释报告（仅供调试）
 
 示例：
     # 使用4线程编译
@@ -33,6 +45,9 @@ Cython 批量编译工具 —— 将整个 Python 项目编译为 .pyd/.so 文
     # 排除 tests 目录和所有 config.py 文件
     python generate_pyd.py my_project/ --exclude-dir tests --exclude-py *config.py
 
+    # 合并链接为一个共享库，并按基准测试的剖析数据优化
+    python generate_pyd.py my_project/ --onefile --pgo "python -m my_project.bench"
+
 版本历史：
     v1.0: 初始版本
     v1.1: 支持命令行参数，优化编译体验
@@ -48,38 +63,83 @@ Cython 批量编译工具 —— 将整个 Python 项目编译为 .pyd/.so 文
     v2.4: 修复路径解析问题，确保输出目录正确 (2025-09-17 09:00)
     v2.5: 支持跳过编译失败文件，保留 .py 源码并提示用户 (2025-09-17 10.12)
     v2.6: 增强错误报告，显示错误文件的行号以及代码上下文 (2025-09-17 10:41)
+    v2.7: 批量 Cython 预处理与增量构建，POSIX 下直接并行调用 C 编译器；新增 -j/--jobs、
+          --force/--no-force、--link-excluded、--onefile、--shared-utility、--no-native、
+          --pgo、--tmpfs、--c-cache、--annotate，支持在脚本中调用 main(argv) (2026-10-15)
 """
 
-from contextlib import redirect_stderr
+from __future__ import annotations
+
+from contextlib import redirect_stderr, redirect_stdout
+import copy
+import hashlib
 import io
 import os
 import sys
+import shlex
 import shutil
+import subprocess
+import sysconfig
+import time
+import re
 import argparse
+import tempfile
 import textwrap
-import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Tuple, Set
-from setuptools import setup, Extension
-from Cython.Build import cythonize
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterator, List, Optional, Tuple, Set, Union
+
+# setuptools / Cython 导入耗时较长，延迟到实际使用的函数内导入（--help 与参数校验无需等待）
+if TYPE_CHECKING:
+    from setuptools import Extension
 
 
 # ========================
 # 📦 全局常量配置
 # ========================
 
-VERSION = "v2.6 (2025-09-17)"
+VERSION = "v2.7 (2026-10-15)"
 AUTHOR = "Kaining Wang"
 
 # 默认排除的目录名集合（不影响用户自定义）
-EXCLUDE_DIRS: Set[str] = {".idea", "venv", ".venv", ".cache", "build", "__pycache__"}
+EXCLUDE_DIRS: FrozenSet[str] = frozenset({".idea", "venv", ".venv", ".cache", "build", "__pycache__"})
 
-# 永久排除的特定文件（如构建脚本）
+# 永久排除的特定文件（如构建脚本）；修改时同步 _scan.pyx
 EXCLUDE_FILES: Set[str] = {"setup.py"}
 
-# 忽略以这些前缀开头的模块（保留 __init__.py）
+# 忽略以这些前缀开头的模块（保留 __init__.py）；修改时同步 _scan.pyx
 EXCLUDE_PREFIXES: Tuple[str, ...] = (".", "_")
 
+# 文件复制缓冲区大小（与 coreutils cp 一致，128 KiB）
+COPY_BUFSIZE = 128 * 1024
+
+# Python 源文件后缀（不作为资源文件复制）
+PYTHON_SUFFIXES: Tuple[str, ...] = (".py", ".pyx")
+
+# Cython 全局编译选项（Cython.Compiler.Options）：不保留文档字符串，缩小产物并减少逆向线索
+CYTHON_OPTIONS: Dict[str, bool] = {"docstrings": False}
+
+# 传给 C 编译器的 Cython 运行时宏：显式关闭跟踪 / 性能剖析钩子
+# （CYTHON_FAST_THREAD_STATE 等快速路径宏由 Cython 按解释器自行选择，强制开启会破坏 GraalPy 等实现）
+CYTHON_MACROS: List[Tuple[str, str]] = [
+    ("CYTHON_TRACE", "0"),
+    ("CYTHON_PROFILE", "0"),
+]
+
+# 共享工具模块名（--shared-utility）：各模块公用的 Cython 运行时代码集中到该模块，位于输出根目录
+SHARED_UTILITY_MODULE = "_pyshield_shared"
+
+# --tmpfs 使用的内存文件系统及其最低可用空间要求
+TMPFS_DIR = "/dev/shm"
+TMPFS_MIN_FREE = 2 * 1024 ** 3
+
+# 目录遍历的并发线程数（I/O 密集，与 CPU 核数无关）
+SCAN_WORKERS = 32
+
+# 进度刷新的最小间隔（秒），避免频繁写终端
+PROGRESS_INTERVAL = 0.1
+
 # ANSI 颜色定义（新增）
 RESET = "\033[0m"
 GRAY = "\033[90m"
@@ -93,113 +153,364 @@ WHITE = "\033[97m"
 LIGHT_PURPLE = "\033[95m"   # 淡紫色用于标记
 BOLD = "\033[1m"
 
+# Cython 错误输出中的 "文件名:行号:" 片段（兼容 Windows 盘符，行号可缺省）
+CYTHON_ERROR_RE = re.compile(r"((?:[A-Za-z]:)?[^\s:'\"()]+\.pyx?)(?::(\d+):)?")
+
+
+# ========================
+# 🚶 工具函数：遍历项目目录（剪枝排除目录）
+# ========================
+def _list_dir(path: str) -> List[os.DirEntry]:
+    """读取单个目录的全部条目（在线程池中运行，readdir 期间释放 GIL）。"""
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except PermissionError:
+        return []  # 与 rglob 一致，忽略无权限目录
+
+
+def _walk(
+    root: str, exclude_dirs_set: FrozenSet[str]
+) -> Iterator[Tuple[Tuple[str, ...], os.DirEntry]]:
+    """
+    基于 os.scandir 的广度优先遍历，遇到排除目录直接跳过整棵子树。
+    每个目录的读取提交到线程池，网络盘 / 杀毒扫描下的系统调用延迟相互重叠；
+    结果按提交顺序取出，遍历顺序保持确定。
+
+    Args:
+        root: 起始目录
+        exclude_dirs_set: 排除目录名集合
+
+    Yields:
+        (所在目录的相对路径元组, 非目录条目)；DirEntry 已缓存文件类型，无需再次 stat
+    """
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        pending = deque([((), executor.submit(_list_dir, root))])
+        while pending:
+            rel_dirs, future = pending.popleft()
+            for entry in future.result():
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in exclude_dirs_set:
+                        continue
+                    pending.append((rel_dirs + (entry.name,), executor.submit(_list_dir, entry.path)))
+                else:
+                    yield rel_dirs, entry
+
+
+# ========================
+# 📊 工具类：单行原地刷新的进度显示
+# ========================
+class _Progress:
+    """按时间节流的单行进度显示（最后一项必定刷新）；错误信息应由调用方立即输出。"""
+
+    def __init__(self, total: int, label: str):
+        self.total = total
+        self.label = label
+        self.count = 0
+        self.next_tick = 0.0
+
+    def tick(self) -> None:
+        """完成一项，必要时刷新进度行。"""
+        self.count += 1
+        now = time.monotonic()
+        if now >= self.next_tick or self.count == self.total:
+            sys.stdout.write(f"\r{self.label} {self.count}/{self.total}")
+            sys.stdout.flush()
+            self.next_tick = now + PROGRESS_INTERVAL
+
+
+# ========================
+# 📋 工具函数：快速复制单个文件
+# ========================
+def _copy_file_range(infd: int, outfd: int, size: int) -> None:
+    """以 os.copy_file_range 复制（Linux；Btrfs/XFS 上为 reflink，不实际搬运数据）。"""
+    offset = 0
+    while offset < size:
+        copied = os.copy_file_range(infd, outfd, size - offset, offset, offset)
+        if copied == 0:
+            # 部分内核 / 文件系统不支持时返回 0 而非报错：交由调用方换下一种方式
+            raise OSError("copy_file_range 未复制任何数据")
+        offset += copied
+
+
+def _sendfile(infd: int, outfd: int, size: int) -> None:
+    """以 os.sendfile 复制（数据不经过用户态）。"""
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(outfd, infd, offset, size - offset)
+        if sent == 0:
+            raise OSError("sendfile 未复制任何数据")
+        offset += sent
+
+
+def _fast_copy(src, dst) -> None:
+    """
+    复制文件内容及元数据。依次尝试内核态的 os.copy_file_range（可 reflink）与
+    os.sendfile（Linux），均不支持时回退为 128 KiB 大缓冲区的 copyfileobj。
+
+    Args:
+        src: 源文件路径
+        dst: 目标文件路径
+    """
+    # 目标与源文件共享 inode 时以 "wb" 打开会截断源文件：同一路径直接返回，
+    # 上次构建留下的硬链接则先删除，使输出获得独立的副本
+    try:
+        if os.path.samestat(os.stat(src), os.stat(dst)):
+            if os.path.realpath(src) == os.path.realpath(dst):
+                return
+            os.unlink(dst)
+    except FileNotFoundError:
+        pass
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        infd, outfd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(infd).st_size
+        for kernel_copy in (_copy_file_range, _sendfile):
+            try:
+                kernel_copy(infd, outfd, size)
+                break
+            except (AttributeError, OSError):
+                # 平台不提供（Windows / macOS）或文件系统不支持，清空目标后换下一种方式
+                os.ftruncate(outfd, 0)
+        else:
+            fsrc.seek(0)
+            fdst.seek(0)
+            shutil.copyfileobj(fsrc, fdst, COPY_BUFSIZE)
+    shutil.copystat(src, dst)
+
+
+def _link_or_copy(src, dst) -> None:
+    """
+    优先创建硬链接（同一文件系统下不复制任何数据），失败时回退为 _fast_copy。
+
+    Args:
+        src: 源文件路径
+        dst: 目标文件路径
+    """
+    try:
+        os.unlink(dst)  # 移除上次构建的残留，否则 os.link 会因目标已存在而失败
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+    except OSError:
+        _fast_copy(src, dst)
+
+
+def _copy_one(
+    src: Union[str, Path], dst: Path, st: Optional[os.stat_result] = None
+) -> Tuple[Union[str, Path], Optional[Exception]]:
+    """
+    复制单个文件（目标目录需已存在），捕获异常以便线程池汇总结果。
+    若提供扫描阶段的 stat 且文件为空，则直接创建空文件并同步时间戳，不读写内容。
+
+    Returns:
+        (源文件, 异常或 None)
+    """
+    try:
+        if st is not None and st.st_size == 0:
+            open(dst, "wb").close()
+            os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+        else:
+            _fast_copy(src, dst)
+        return src, None
+    except Exception as e:
+        return src, e
+
+
+def _copy_files(
+    pairs: List[tuple], nthreads: int
+) -> Iterator[Tuple[Union[str, Path], Optional[Exception]]]:
+    """
+    使用线程池并发复制文件（文件 I/O 期间会释放 GIL），按提交顺序返回结果。
+    目标目录在启动线程池前去重并按深度逐一创建，避免每个文件重复 mkdir。
+
+    Args:
+        pairs: (源文件, 目标文件[, stat]) 列表，参数与 _copy_one 一致
+        nthreads: 编译线程数，复制线程数取其 4 倍（上限 32）
+
+    Yields:
+        (源文件, 异常或 None)
+    """
+    # 预先创建所有目标目录（父目录先于子目录）
+    for parent in sorted({pair[1].parent for pair in pairs}, key=lambda p: len(p.parts)):
+        try:
+            parent.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            pass  # 交由后续复制报告具体文件的错误
+
+    with ThreadPoolExecutor(max_workers=min(32, max(1, nthreads) * 4)) as executor:
+        yield from executor.map(lambda pair: _copy_one(*pair), pairs)
+
 
 # ========================
 # 🔍 工具函数：判断是否应编译该模块
 # ========================
+def _compile_exclude(
+    exclude_py_set: FrozenSet[str],
+) -> Tuple[FrozenSet[str], FrozenSet[str], List[str]]:
+    """
+    预先解析 .py 排除规则，使逐文件判断只需两次哈希查找。
+
+    Args:
+        exclude_py_set: 用户指定要排除的 .py 文件集合（支持精确路径或 *filename.py）
+
+    Returns:
+        (精确路径集合, 通配符文件名集合, 非法模式列表)
+        非法格式如 "*/greeter.py"、"utils/*.py"
+    """
+    exact = set()
+    wildcard_basenames = set()
+    invalid_patterns = []
+
+    for pattern in sorted(exclude_py_set):
+        if "*" not in pattern:
+            exact.add(pattern.replace("\\", "/"))  # 统一为 "/" 分隔，与扫描阶段一致
+        elif (
+            pattern.startswith("*")
+            and pattern.endswith(".py")
+            and len(pattern) > 3
+            and "/" not in pattern[1:]
+            and "\\" not in pattern[1:]
+            and "*" not in pattern[1:]
+        ):
+            wildcard_basenames.add(pattern[1:])
+        else:
+            invalid_patterns.append(pattern)
+
+    return frozenset(exact), frozenset(wildcard_basenames), invalid_patterns
+
+
 def is_valid_module(
-    file_path: Path,
-    exclude_dirs_set: Set[str],
-    exclude_py_set: Set[str],
-    root_path: Path,
+    file_name: str,
+    rel_path: str,
+    exclude_exact: FrozenSet[str],
+    exclude_wild_basenames: FrozenSet[str],
 ) -> bool:
     """
     判断一个 .py 文件是否应该参与 Cython 编译。
+    排除目录已在 _walk 遍历时剪枝，此处不再检查。
 
     Args:
-        file_path: 待检查的 .py 文件路径
-        exclude_dirs_set: 合并后的排除目录集合
-        exclude_py_set: 用户指定要排除的 .py 文件集合（支持精确路径或 *filename.py）
-        root_path: 项目根目录，用于计算相对路径
+        file_name: 文件名（如 helper.py）
+        rel_path: 相对项目根目录的路径，以 "/" 分隔（如 utils/helper.py）
+        exclude_exact: 精确路径排除集合（由 _compile_exclude 生成）
+        exclude_wild_basenames: "*filename.py" 通配排除的文件名集合（由 _compile_exclude 生成）
 
     Returns:
         True 表示应编译；False 表示跳过
     """
 
     # 仅处理 .py 文件
-    if file_path.suffix != ".py":
+    if not file_name.endswith(".py"):
         return False
 
     # 排除固定名称文件（如 setup.py）
-    if file_path.name in EXCLUDE_FILES:
+    if file_name in EXCLUDE_FILES:
         return False
 
     # 排除隐藏或私有文件（但保留 __init__.py）
-    if file_path.name.startswith(EXCLUDE_PREFIXES) and file_path.name != "__init__.py":
+    if file_name.startswith(EXCLUDE_PREFIXES) and file_name != "__init__.py":
         return False
 
-    # 排除位于任何排除目录中的文件
-    if any(part in exclude_dirs_set for part in file_path.parts):
+    # 精确路径排除（如 "utils/config.py"）或通配符排除（如 "*config.py"）
+    if rel_path in exclude_exact or file_name in exclude_wild_basenames:
         return False
 
-    try:
-        rel_path = str(file_path.relative_to(root_path))
-    except ValueError:
-        return False  # 不在项目内
-
-    # 精确路径排除（如 "utils/config.py"）
-    if rel_path in exclude_py_set:
-        return False
+    return True
 
-    # 通配符排除（只允许 "*filename.py" 格式）
-    for pattern in exclude_py_set:
-        if not pattern.startswith("*") or not pattern.endswith(".py"):
-            continue
-        if len(pattern) <= 2 or "/" in pattern[1:]:
-            continue  # 非法格式，如 */file.py 或 utils/*.py
-        if file_path.name == pattern[1:]:
-            return False
 
-    return True
+# 若已编译扫描加速模块（cythonize -i _scan.pyx），优先使用其 Cython 实现
+try:
+    from _scan import is_valid_module  # noqa: F811
+except ImportError:
+    pass
 
 
 # ========================
-# 🧩 核心函数：扫描项目获取扩展模块与包结构
+# 🧩 核心函数：一次遍历扫描项目（模块、包结构、__init__.py、资源文件）
 # ========================
-def collect_extensions_and_packages(
-    project_root: str, exclude_dirs_set: Set[str], exclude_py_set: Set[str]
-) -> Tuple[List[Extension], List[str]]:
+def scan_project(
+    project_root: str,
+    exclude_dirs_set: FrozenSet[str],
+    exclude_py_exact: FrozenSet[str],
+    exclude_py_wild_basenames: FrozenSet[str],
+) -> Tuple[
+    List[Extension], List[str], List[Tuple[str, str, os.stat_result]], List[Tuple[str, str]]
+]:
     """
-    递归扫描项目目录，收集可编译模块及包结构。
+    递归扫描项目目录（仅遍历一次），按文件类型分类收集：
+    可编译模块、包结构、需保留的 __init__.py、需复制的非 Python 资源文件。
 
     Args:
         project_root: 项目根目录路径
         exclude_dirs_set: 排除目录集合
-        exclude_py_set: 排除 .py 文件集合
+        exclude_py_exact: 精确路径排除集合
+        exclude_py_wild_basenames: 通配排除的文件名集合
 
     Returns:
-        (extensions列表, packages列表)
+        (extensions列表, packages列表, __init__.py 列表, 资源文件列表)；
+        __init__.py 元素为 (源文件路径, 相对路径, stat)，资源文件元素为 (源文件路径, 相对路径)
     """
+    try:
+        from setuptools import Extension
+    except ImportError:  # 未安装 setuptools 的旧环境（Python < 3.12）
+        from distutils.extension import Extension
+
     root_path = Path(project_root).resolve()
     extensions: List[Extension] = []
     packages: Set[str] = set()
+    init_files: List[Tuple[str, str, os.stat_result]] = []
+    resource_files: List[Tuple[str, str]] = []
+    module_dirs: Set[Tuple[str, ...]] = set()  # 含有效模块的目录
+    init_dirs: Set[Tuple[str, ...]] = set()  # 含 __init__.py 的目录
 
     print(f"{LIGHT_PURPLE}[SCAN]{RESET} 正在扫描项目目录，收集模块和包结构...")
 
-    # 遍历所有 .py 文件
-    for py_file in root_path.rglob("*.py"):
+    # 单次遍历（排除目录在遍历时剪枝，相对路径在遍历中增量构造）
+    for rel_dirs, entry in _walk(str(root_path), exclude_dirs_set):
+        file_name = entry.name
+        rel_path = "/".join(rel_dirs + (file_name,))
+
+        # 非 Python 资源文件：原样复制（纯字符串判断，文件类型取自 DirEntry 缓存）
+        if not file_name.lower().endswith(PYTHON_SUFFIXES):
+            if entry.is_file():
+                resource_files.append((entry.path, rel_path))
+            continue
+
+        if not file_name.endswith(".py"):
+            continue
+
+        # __init__.py：原样复制以维持包结构
+        if file_name == "__init__.py":
+            init_dirs.add(rel_dirs)
+            init_files.append((entry.path, rel_path, entry.stat()))
+
         # 跳过不符合编译条件的文件
-        if not is_valid_module(py_file, exclude_dirs_set, exclude_py_set, root_path):
+        if not is_valid_module(
+            file_name, rel_path, exclude_py_exact, exclude_py_wild_basenames
+        ):
             continue
 
-        # 构造模块名（如 src/utils/helper.py → src.utils.helper）
-        module_name = ".".join(py_file.with_suffix("").relative_to(root_path).parts)
+        module_dirs.add(rel_dirs)
 
         # 非 __init__.py 的文件才作为扩展模块编译
-        if py_file.name != "__init__.py":
-            extensions.append(Extension(module_name, [str(py_file)]))
-
-        # 向上追溯包含 __init__.py 的父级目录，注册为包
-        parent = py_file.parent
-        while True:
-            init_file = parent / "__init__.py"
-            if init_file.exists():
-                pkg_name = ".".join(parent.relative_to(root_path).parts)
-                packages.add(pkg_name or ".")  # 根目录记为 "."
-            # 到达项目根目录则终止向上查找
-            if parent == root_path:
+        # 构造模块名（如 src/utils/helper.py → src.utils.helper）
+        if file_name != "__init__.py":
+            module_name = ".".join(rel_dirs + (file_name[:-3],))
+            extensions.append(Extension(module_name, [entry.path]))  # 绝对路径（根目录已 resolve）
+
+    # 向上追溯含有效模块目录的各级父目录，含 __init__.py 的注册为包；
+    # 已追溯过的目录（及其所有祖先）不再重复处理
+    visited: Set[Tuple[str, ...]] = set()
+    for rel_dirs in module_dirs:
+        for depth in range(len(rel_dirs), -1, -1):
+            ancestor = rel_dirs[:depth]
+            if ancestor in visited:
                 break
-            parent = parent.parent
+            visited.add(ancestor)
+            if ancestor in init_dirs:
+                packages.add(".".join(ancestor) or ".")  # 根目录记为 "."
 
     sorted_packages = sorted(packages)
     print(f"{GREEN}[SUCCESS]{RESET} 找到 {len(extensions)} 个可编译模块，{len(sorted_packages)} 个包")
@@ -209,56 +520,43 @@ def collect_extensions_and_packages(
         for pkg in sorted_packages:
             print(f"  - {pkg}")
 
-    return extensions, sorted_packages
+    return extensions, sorted_packages, init_files, resource_files
 
 
 # ========================
 # 📁 工具函数：复制非 Python 资源文件
 # ========================
-def copy_non_python_files(source_root: str, dest_root: str, exclude_dirs_set: Set[str]):
+def copy_non_python_files(
+    resource_files: List[Tuple[str, str]], dest_root: str, nthreads: int = 1
+):
     """
     复制所有非 .py/.pyx 文件（如 .json, .txt, .yaml 等）到输出目录。
 
     Args:
-        source_root: 源路径
+        resource_files: scan_project 收集的 (源文件路径, 相对路径) 列表
         dest_root: 目标路径
-        exclude_dirs_set: 排除目录集合
+        nthreads: 编译线程数（用于确定复制线程池大小）
     """
-    source = Path(source_root)
     dest = Path(dest_root)
-    allowed_suffixes = {".py", ".pyx"}
-
-    # 收集所有符合条件的非 Python 文件
-    files_to_copy = [
-        f
-        for f in source.rglob("*")
-        if f.is_file()
-        and f.suffix.lower() not in allowed_suffixes
-        and not any(part in exclude_dirs_set for part in f.parts)
-    ]
 
-    if not files_to_copy:
+    if not resource_files:
         print("- 资源文件: 无非Python资源文件需要复制")
         return
 
-    print(f"- 资源文件: 找到 {len(files_to_copy)} 个文件，开始复制...")
+    print(f"- 资源文件: 找到 {len(resource_files)} 个文件，开始复制...")
+
+    # 并发复制文件并保留元数据
+    pairs = [(src, dest / rel_path) for src, rel_path in resource_files]
+    results = zip(resource_files, _copy_files(pairs, nthreads))
 
     copied_count = 0
-    for i, file_path in enumerate(files_to_copy, 1):
-        rel_path = None
-        try:
-            rel_path = file_path.relative_to(source)
-            target = dest / rel_path
-            target.parent.mkdir(parents=True, exist_ok=True)  # 确保目标目录存在
-            shutil.copy2(file_path, target)  # 复制文件并保留元数据
-            copied_count += 1
-
-            # 每10个或最后一个更新一次进度条
-            if copied_count % 10 == 0 or i == len(files_to_copy):
-                sys.stdout.write(f"  - 进度: {copied_count}/{len(files_to_copy)}\r")
-                sys.stdout.flush()
-        except Exception as e:
-            print(f"\n  X 复制资源文件失败 {rel_path}: {e}")
+    progress = _Progress(len(resource_files), "  - 进度:")
+    for ((_, rel_path), (_, error)) in results:
+        progress.tick()
+        if error is not None:
+            print(f"\n  X 复制资源文件失败 {rel_path}: {error}")
+            continue
+        copied_count += 1
 
     print(f"\n  ✓ 已复制 {copied_count} 个资源文件")
 
@@ -266,47 +564,38 @@ def copy_non_python_files(source_root: str, dest_root: str, exclude_dirs_set: Se
 # ========================
 # 📦 工具函数：复制 __init__.py 文件以维持包结构
 # ========================
-def copy_init_py_files(source_root: str, dest_root: str, exclude_dirs_set: Set[str]):
+def copy_init_py_files(
+    init_files: List[Tuple[str, str, os.stat_result]], dest_root: str, nthreads: int = 1
+):
     """
     复制所有有效的 __init__.py 文件，保证编译后仍能正常导入。
+    空的 __init__.py（仅作包标记）直接创建空文件，不读写内容。
 
     Args:
-        source_root: 源路径
+        init_files: scan_project 收集的 (源文件路径, 相对路径, stat) 列表
         dest_root: 目标路径
-        exclude_dirs_set: 排除目录集合
+        nthreads: 编译线程数（用于确定复制线程池大小）
     """
-    source = Path(source_root)
     dest = Path(dest_root)
 
-    # 获取所有 __init__.py 文件，并过滤掉在排除目录中的
-    init_files = [
-        f
-        for f in source.rglob("__init__.py")
-        if not any(part in exclude_dirs_set for part in f.parts)
-    ]
-
     if not init_files:
         print("- 包结构: 未找到有效的 __init__.py 文件")
         return
 
     print(f"- 包结构: 找到 {len(init_files)} 个 __init__.py 文件，开始复制...")
 
+    # 并发复制并保留时间戳等信息
+    pairs = [(src, dest / rel_path, st) for src, rel_path, st in init_files]
+    results = zip(init_files, _copy_files(pairs, nthreads))
+
     copied_count = 0
-    for i, file_path in enumerate(init_files, 1):
-        rel_path = None
-        try:
-            rel_path = file_path.relative_to(source)
-            target = dest / rel_path
-            target.parent.mkdir(parents=True, exist_ok=True)  # 创建中间目录
-            shutil.copy2(file_path, target)  # 复制并保留时间戳等信息
-            copied_count += 1
-
-            # 每5个或最后一个刷新进度
-            if copied_count % 5 == 0 or i == len(init_files):
-                sys.stdout.write(f"  - 进度: {copied_count}/{len(init_files)}\r")
-                sys.stdout.flush()
-        except Exception as e:
-            print(f"\n  X 复制包初始化文件失败 {rel_path}: {e}")
+    progress = _Progress(len(init_files), "  - 进度:")
+    for ((_, rel_path, _), (_, error)) in results:
+        progress.tick()
+        if error is not None:
+            print(f"\n  X 复制包初始化文件失败 {rel_path}: {error}")
+            continue
+        copied_count += 1
 
     print(f"\n  ✓ 已保留 {copied_count} 个包结构")
 
@@ -315,40 +604,61 @@ def copy_init_py_files(source_root: str, dest_root: str, exclude_dirs_set: Set[s
 # 🗃️ 工具函数：复制用户排除但需保留的目录（如 tests/, docs/）
 # ========================
 def copy_excluded_directories(
-    source_root: str, dest_root: str, exclude_dirs_list: List[str]
+    source_root: str,
+    dest_root: str,
+    exclude_dirs: FrozenSet[str],
+    nthreads: int = 1,
+    link: bool = False,
 ):
     """
     复制用户指定的排除目录（例如测试或文档），不参与编译但保留在输出中。
+    目录结构由 copytree 顺序创建，文件内容交由线程池并发复制。
 
     Args:
         source_root: 源路径
         dest_root: 目标路径
-        exclude_dirs_list: 要复制的目录名列表
+        exclude_dirs: 要复制的目录名集合（按名称排序处理）
+        nthreads: 编译线程数（用于确定复制线程池大小）
+        link: 同一文件系统下改用硬链接，不复制文件内容（输出与源码共享 inode，
+            修改任一侧的文件内容都会反映到另一侧）
     """
-    if not exclude_dirs_list:
+    if not exclude_dirs:
         return
 
     source = Path(source_root)
     dest = Path(dest_root)
 
-    print(f"- 排除目录: 准备复制 {len(exclude_dirs_list)} 个排除目录...")
+    print(f"- 排除目录: 准备复制 {len(exclude_dirs)} 个排除目录...")
 
     copied = []
-    for name in exclude_dirs_list:
-        src_dir = source / name
-        dst_dir = dest / name
+    with ThreadPoolExecutor(max_workers=min(32, max(1, nthreads) * 4)) as executor:
+        for name in sorted(exclude_dirs):
+            src_dir = source / name
+            dst_dir = dest / name
 
-        if not src_dir.is_dir():
-            print(f"  ⚠️  跳过不存在的目录: {name}")
-            continue
+            if not src_dir.is_dir():
+                print(f"  ⚠️  跳过不存在的目录: {name}")
+                continue
 
-        try:
-            # 递归复制整个目录树，允许目标已存在
-            shutil.copytree(src_dir, dst_dir, dirs_exist_ok=True)
-            copied.append(name)
-            print(f"  ✓ 已复制排除目录: {name}")
-        except Exception as e:
-            print(f"  X 复制目录失败 {name}: {e}")
+            futures = []
+            try:
+                # 仅在用户要求且位于同一文件系统时使用硬链接，否则复制文件内容
+                same_fs = link and os.stat(src_dir).st_dev == os.stat(dest).st_dev
+                copy_func = _link_or_copy if same_fs else _fast_copy
+
+                # 递归复制整个目录树，允许目标已存在；文件复制提交到线程池
+                shutil.copytree(
+                    src_dir,
+                    dst_dir,
+                    dirs_exist_ok=True,
+                    copy_function=lambda s, d: futures.append(executor.submit(copy_func, s, d)),
+                )
+                for future in futures:
+                    future.result()  # 等待完成，并抛出首个复制异常
+                copied.append(name)
+                print(f"  ✓ 已复制排除目录: {name}")
+            except Exception as e:
+                print(f"  X 复制目录失败 {name}: {e}")
 
     print(f"  ✓ 共成功复制 {len(copied)} 个排除目录")
 
@@ -357,50 +667,49 @@ def copy_excluded_directories(
 # 📄 工具函数：复制用户排除但需保留的 .py 文件（如配置文件）
 # ========================
 def copy_excluded_python_files(
-    source_root: str, dest_root: str, exclude_py_list: List[str]
+    source_root: str,
+    dest_root: str,
+    exclude_py: FrozenSet[str],
+    exclude_dirs_set: FrozenSet[str],
+    nthreads: int = 1,
 ):
     """
     复制用户指定的 .py 文件（如 config.py），即使它们不参与编译。
+    所有通配模式共用一次目录遍历；精确路径直接定位，无需遍历。
 
     Args:
         source_root: 源路径
         dest_root: 目标路径
-        exclude_py_list: 要保留的 .py 文件路径或通配模式列表
+        exclude_py: 要保留的 .py 文件路径或通配模式集合
+        exclude_dirs_set: 排除目录集合（遍历时剪枝）
+        nthreads: 编译线程数（用于确定复制线程池大小）
     """
-    if not exclude_py_list:
+    if not exclude_py:
         return
 
-    source = Path(source_root)
     dest = Path(dest_root)
 
-    print(f"- 排除文件: 准备复制 {len(exclude_py_list)} 个排除的 Python 文件...")
+    print(f"- 排除文件: 准备复制 {len(exclude_py)} 个排除的 Python 文件...")
 
-    matched_files = []
-    invalid_patterns = []
-
-    # 分析每种排除模式
-    for pattern in exclude_py_list:
-        pattern = pattern.strip()
-        if "*" in pattern:
-            # 仅允许 "*filename.py" 形式
-            if (
-                not pattern.startswith("*")
-                or not pattern.endswith(".py")
-                or len(pattern) < 3
-                or "/" in pattern[1:]
-            ):
-                invalid_patterns.append(pattern)
-                continue
+    # 分析排除模式（仅允许精确路径或 "*filename.py" 形式）
+    exact_paths, wildcard_basenames, invalid_patterns = _compile_exclude(exclude_py)
 
-            filename = pattern[1:]
-            found = list(source.rglob(filename))  # 全局搜索匹配文件
-            matched_files.extend((f, pattern) for f in found)
+    # 精确路径：直接定位
+    matched: Dict[str, str] = {}
+    for pattern in sorted(exact_paths):
+        file_path = os.path.join(source_root, pattern)
+        if pattern.endswith(".py") and os.path.isfile(file_path):
+            matched[pattern] = file_path
         else:
-            file_path = source / pattern
-            if file_path.exists() and file_path.suffix == ".py":
-                matched_files.append((file_path, pattern))
-            else:
-                invalid_patterns.append(pattern)
+            invalid_patterns.append(pattern)
+
+    # 通配模式：全局搜索匹配文件（单次遍历）
+    if wildcard_basenames:
+        for rel_dirs, entry in _walk(source_root, exclude_dirs_set):
+            if entry.name in wildcard_basenames:
+                matched["/".join(rel_dirs + (entry.name,))] = entry.path
+
+    matched_files = list(matched.items())
 
     # 报告无效模式
     if invalid_patterns:
@@ -415,86 +724,395 @@ def copy_excluded_python_files(
 
     print(f"  - 找到 {len(matched_files)} 个匹配文件，开始复制...")
 
+    pairs = [(f, dest / rel_path) for rel_path, f in matched_files]
+    results = zip(matched_files, _copy_files(pairs, nthreads))
+
     copied_count = 0
-    for file_path, pattern in matched_files:
-        rel_path = None
-        try:
-            rel_path = file_path.relative_to(source)
-            target = dest / rel_path
-            target.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(file_path, target)
-            copied_count += 1
-
-            # 每5个或最后一个刷新进度
-            if copied_count % 5 == 0 or copied_count == len(matched_files):
-                sys.stdout.write(f"    - 进度: {copied_count}/{len(matched_files)}\r")
-                sys.stdout.flush()
-        except Exception as e:
-            print(f"\n    X 复制失败 {rel_path}: {e}")
+    progress = _Progress(len(matched_files), "    - 进度:")
+    for ((rel_path, _), (_, error)) in results:
+        progress.tick()
+        if error is not None:
+            print(f"\n    X 复制失败 {rel_path}: {error}")
+            continue
+        copied_count += 1
 
     print(f"\n  ✓ 已复制 {copied_count} 个排除的 Python 文件")
 
 
 # ========================
-# ⚙️ 安全编译函数：逐个尝试编译并捕获详细错误
+# ⚙️ 安全编译函数：批量编译，失败时逐个定位错误
 # ========================
+def _locate_failed_sources(error_text: str, extensions: List[Extension]) -> Set[str]:
+    """
+    从 Cython 错误输出中解析 "文件名:行号:" 片段，定位出错的源文件。
+
+    Args:
+        error_text: 捕获的 stderr 与异常信息
+        extensions: 本轮参与编译的扩展列表
+
+    Returns:
+        出错源文件集合（取值为 ext.sources[0]）
+    """
+    by_path = {
+        os.path.normcase(os.path.abspath(ext.sources[0])): ext.sources[0]
+        for ext in extensions
+    }
+    located = set()
+    for token, _ in CYTHON_ERROR_RE.findall(error_text):
+        src = by_path.get(os.path.normcase(os.path.abspath(token)))
+        if src is not None:
+            located.add(src)
+    return located
+
+
+def _with_error_location(error_msg: str) -> str:
+    """若错误信息中含有 "文件名:行号:"，在首行补充结构化的出错位置。"""
+    for match in CYTHON_ERROR_RE.finditer(error_msg):
+        if match.group(2):
+            return f"出错位置: {match.group(1)} 第 {match.group(2)} 行\n{error_msg}"
+    return error_msg
+
+
+def _apply_cython_options() -> None:
+    """设置 Cython 全局编译选项（进程级状态，spawn 启动的子进程需重新设置）。"""
+    from Cython.Compiler import Options
+
+    for name, value in CYTHON_OPTIONS.items():
+        setattr(Options, name, value)
+
+
+def _warm_cython_worker() -> None:
+    """
+    进程池初始化函数：每个子进程启动时导入 Cython 编译器并设置全局选项，仅执行一次。
+    fork 启动时直接继承主进程状态，spawn（Windows）时避免首个任务承担导入开销。
+    """
+    import Cython.Build  # noqa: F401  （同时导入 Cython.Compiler.Main）
+
+    _apply_cython_options()
+
+
+# 进程池子进程内复用的 stderr 捕获缓冲区（每个进程同一时刻只处理一个任务）
+_STDERR_BUF = io.StringIO()
+
+
+def _cythonize_one(
+    ext: Extension, cython_kwargs: Dict[str, object]
+) -> Tuple[str, Optional[List[Extension]], str]:
+    """
+    在子进程中对单个扩展执行 Cython 预处理（顶层函数，便于进程池序列化）。
+    子进程由 _warm_cython_worker 初始化，Cython 已导入且全局选项已设置。
+
+    Args:
+        ext: 扩展模块
+        cython_kwargs: 与批量编译相同的 cythonize 参数（见 safe_cythonize）
+
+    Returns:
+        (源文件, 成功时的扩展列表或 None, 错误信息)
+    """
+    from Cython.Build import cythonize
+
+    src_file = ext.sources[0]
+    stderr_capture = _STDERR_BUF
+    stderr_capture.seek(0)
+    stderr_capture.truncate()
+    try:
+        with redirect_stderr(stderr_capture):
+            result = cythonize([ext], nthreads=1, compile_time_env=False, **cython_kwargs)
+        if result:
+            return src_file, result, ""
+        error_msg = stderr_capture.getvalue().strip() or "未知编译错误"
+    except Exception as e:
+        error_msg = f"{stderr_capture.getvalue().strip()}\n\nException: {repr(e)}"
+    return src_file, None, _with_error_location(error_msg)
+
+
+def _cythonize_in_pool(
+    exts: List[Extension], cython_kwargs: Dict[str, object], nthreads: int, label: str
+) -> List[Tuple[str, Optional[List[Extension]], str]]:
+    """
+    通过进程池逐个编译扩展（子进程由 _warm_cython_worker 初始化，任何启动方式下
+    Cython 全局选项都已设置），错误信息即时输出。
+
+    Returns:
+        按原始顺序排列的 (源文件, 成功时的扩展列表或 None, 错误信息)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    outcomes = {}
+    progress = _Progress(len(exts), label)
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(nthreads, len(exts))), initializer=_warm_cython_worker
+    ) as executor:
+        future_to_idx = {
+            executor.submit(_cythonize_one, ext, cython_kwargs): idx
+            for idx, ext in enumerate(exts, 1)
+        }
+        for future in as_completed(future_to_idx):
+            idx = future_to_idx[future]
+            src_file, result, error_msg = outcomes[idx] = future.result()
+            progress.tick()
+
+            # 错误信息立即输出，成功仅更新进度
+            if not result:
+                rel_path = os.path.relpath(src_file, start=os.getcwd())
+                print(f"\n[{idx}/{len(exts)}] Cythonizing {rel_path} ... {RED}X{RESET}\n{error_msg}")
+
+    # 按原始顺序汇总结果，保证报告稳定
+    return [outcomes[idx] for idx in sorted(outcomes)]
+
+
+def _c_cache_key(ext: Extension, directives_hash: str) -> str:
+    """
+    .c 缓存键：模块名、源文件与同名 .pxd 的内容，以及编译指令指纹（含 Cython 版本）的摘要。
+    生成的 .c 内嵌源文件的绝对路径与相对当前目录的路径（用于回溯信息），二者也计入
+    缓存键：只有检出目录与工作目录都相同的构建才能共用缓存。
+    """
+    src_file = ext.sources[0]
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(
+        f"{ext.name}\0{directives_hash}\0{os.path.abspath(src_file)}\0{os.path.relpath(src_file)}".encode()
+    )
+    for path in (src_file, os.path.splitext(src_file)[0] + ".pxd"):
+        try:
+            with open(path, "rb") as f:
+                digest.update(b"\0")
+                digest.update(f.read())
+        except FileNotFoundError:
+            pass
+    return digest.hexdigest()
+
+
+def _cython_c_path(src_file: str, build_dir: str) -> Path:
+    """
+    按 cythonize 的规则推算源文件在 build_dir 下生成的 .c 文件路径
+    （绝对路径去掉盘符与首个分隔符后拼接到 build_dir 下）。
+    """
+    c_file = os.path.splitext(os.path.abspath(src_file))[0] + ".c"
+    c_file = os.path.splitdrive(c_file)[1].split(os.sep, 1)[1]
+    return Path(build_dir) / c_file
+
+
 def safe_cythonize(
     extensions: List[Extension],
     compiler_directives: Dict[str, bool],
     build_temp_dir: str,
+    nthreads: int = 1,
+    force: bool = False,
+    shared_utility: str = "",
+    c_cache: str = "",
+    annotate: bool = False,
 ) -> Tuple[List[Extension], Dict[str, str]]:
     """
-    安全地对每个扩展进行 Cython 预处理，跳过失败项并记录错误详情。
+    安全地对扩展进行 Cython 预处理，跳过失败项并记录错误详情。
+
+    源文件与编译指令均未变化的模块直接复用上次生成的 .c 文件（增量构建，force 时跳过）。
+    其余模块先一次性批量调用 cythonize（利用其内部并行）；若失败，则从错误输出中
+    剔除出错文件后重试批量编译，仅对出错文件通过进程池逐个编译以记录错误信息。
+    子进程启动方式不是 fork 时（spawn / forkserver），全部模块经预热进程池逐个编译。
 
     Args:
         extensions: 扩展模块列表
         compiler_directives: Cython 编译指令
         build_temp_dir: 临时构建目录
+        nthreads: 并行进程数（批量编译与逐个编译共用）
+        force: 是否忽略增量缓存，强制重新生成全部 .c 文件
+        shared_utility: 共享工具模块的完整模块名（空字符串表示不使用）；启用后各模块
+            不再内嵌 Cython 运行时代码，改为导入该模块，其扩展随批量编译一并生成
+        c_cache: 跨构建共享的 .c 缓存目录（空字符串表示不使用），按 _c_cache_key 寻址
+        annotate: 是否在 .c 文件旁生成 HTML 注释报告（需重新生成全部 .c，等同 force）
 
     Returns:
         (成功编译的扩展列表, {失败文件: 错误信息})
     """
+    import multiprocessing
+
+    import Cython
+    from Cython.Build import cythonize
+
     compiled = []
     failed = {}
+    force = force or annotate  # 复用的 .c 不会生成报告
 
-    print(f"{LIGHT_PURPLE}[CYTHON]{RESET} 开始安全编译 {len(extensions)} 个模块（逐个尝试）...")
+    print(f"{LIGHT_PURPLE}[CYTHON]{RESET} 开始批量编译 {len(extensions)} 个模块...")
+    _apply_cython_options()
 
-    for idx, ext in enumerate(extensions, 1):
-        src_file = ext.sources[0]
-        rel_path = os.path.relpath(src_file, start=os.getcwd())
+    # 批量编译与逐个编译共用的 cythonize 参数；注释报告与调试信息默认关闭
+    cython_kwargs: Dict[str, object] = dict(
+        compiler_directives=compiler_directives,
+        build_dir=build_temp_dir,
+        language_level=3,
+        quiet=True,
+        force=force,
+        annotate=annotate,
+        gdb_debug=False,
+    )
+    stderr_capture = io.StringIO()
 
-        # 检查源文件是否存在
-        if not os.path.isfile(src_file):
-            msg = "源文件不存在"
-            print(f"[{idx}/{len(extensions)}] {rel_path} ... {RED}X{RESET}")
-            failed[src_file] = msg
+    # 共享工具模块单独生成：没有源码可供注释，且其失败不应干扰批量编译的错误定位；
+    # 已由当前 Cython 版本生成时 cythonize 会自动跳过，无需指纹
+    shared_exts: List[Extension] = []
+    if shared_utility:
+        cython_kwargs["shared_utility_qualified_name"] = shared_utility  # Cython 3.1+ 才支持
+        try:
+            from setuptools import Extension
+        except ImportError:  # 未安装 setuptools 的旧环境（Python < 3.12）
+            from distutils.extension import Extension
+        shared_ext = Extension(shared_utility, [shared_utility.replace(".", os.sep) + ".c"])
+        try:
+            with redirect_stderr(stderr_capture):
+                shared_exts = cythonize([shared_ext], **dict(cython_kwargs, annotate=False))
+        except Exception as e:
+            # 共享模块不是项目源码，无 .py 可保留：去掉该参数，按普通方式继续构建
+            error_msg = f"{stderr_capture.getvalue().strip()}\n\nException: {e!r}"
+            print(f"  {YELLOW}[WARN]{RESET} 共享工具模块生成失败，各模块改为内嵌运行时代码:\n{error_msg}")
+            del cython_kwargs["shared_utility_qualified_name"]
+            shared_utility = ""
+
+    # 编译指令与 Cython 版本的指纹，任一变化都需重新生成 .c 文件
+    directives_hash = hashlib.sha1(
+        repr((
+            Cython.__version__,
+            sorted(compiler_directives.items()),
+            sorted(CYTHON_OPTIONS.items()),
+            shared_utility,
+        )).encode()
+    ).hexdigest()
+
+    # 检查源文件是否存在；.c 文件比源文件（及同名 .pxd）新且指纹一致时直接复用（增量构建）
+    pending = []
+    cache_keys: Dict[str, str] = {}
+    restored = 0
+    if c_cache:
+        os.makedirs(c_cache, exist_ok=True)
+    for ext in extensions:
+        src_file = ext.sources[0]
+        try:
+            src_mtime = os.stat(src_file).st_mtime
+        except OSError:
+            rel_path = os.path.relpath(src_file, start=os.getcwd())
+            print(f"  X 源文件不存在: {rel_path}")
+            failed[src_file] = "源文件不存在"
             continue
+        # 同名 .pxd 为 .py 补充类型声明，其修改同样需要重新生成 .c
+        try:
+            src_mtime = max(src_mtime, os.stat(os.path.splitext(src_file)[0] + ".pxd").st_mtime)
+        except OSError:
+            pass
 
-        print(f"[{idx}/{len(extensions)}] Cythonizing {rel_path} ... ", end="")
-
-        stderr_capture = io.StringIO()
+        c_out = _cython_c_path(src_file, build_temp_dir)
+        stamp = c_out.with_suffix(".directives.sha1")
+        try:
+            if (
+                not force
+                and c_out.stat().st_mtime >= src_mtime
+                and stamp.read_text(encoding="ascii") == directives_hash
+            ):
+                cached = copy.copy(ext)
+                cached.sources = [str(c_out)]
+                compiled.append(cached)
+                continue
+            c_out.unlink()  # 指纹不一致：删除旧 .c，强制 Cython 重新生成
+        except OSError:
+            pass  # 无缓存或指纹缺失
+
+        # 跨构建的 .c 缓存：按内容寻址，命中则复制到构建目录（不保留缓存文件的 mtime）
+        if c_cache:
+            key = cache_keys[src_file] = _c_cache_key(ext, directives_hash)
+            cache_file = os.path.join(c_cache, key + ".c")
+            if not force and os.path.isfile(cache_file):
+                try:
+                    c_out.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copyfile(cache_file, c_out)
+                    stamp.write_text(directives_hash, encoding="ascii")
+                    cached = copy.copy(ext)
+                    cached.sources = [str(c_out)]
+                    compiled.append(cached)
+                    restored += 1
+                    continue
+                except OSError:
+                    pass  # 缓存不可用时照常生成
+        pending.append(ext)
+
+    fresh = list(pending)
+    if restored:
+        print(f"  - 从 .c 缓存恢复 {restored} 个模块")
+
+    if compiled:
+        print(f"  - 复用 {len(compiled)} 个未变更模块的 .c 文件，需编译 {len(pending)} 个")
+    compiled.extend(shared_exts)
+
+    # cythonize 的内部进程池没有初始化函数：仅 fork 启动的子进程能继承上面设置的
+    # Cython 全局选项（如 docstrings=False）。其他启动方式下改用带初始化函数的进程池
+    # 逐个编译；单线程时在主进程内串行批量编译（nthreads=0；cythonize 对任何非零值、
+    # 包括 1 都会启动进程池）
+    fork = multiprocessing.get_start_method() == "fork"
+    batch_threads = nthreads if nthreads > 1 and fork else 0
+    warmed_pool = nthreads > 1 and not fork
+
+    # 快速路径：批量编译，出错则剔除可定位的出错文件后重试
+    isolated: List[Extension] = []
+    while pending and not warmed_pool:
+        stderr_capture.seek(0)
+        stderr_capture.truncate()
         try:
             with redirect_stderr(stderr_capture):
-                result = cythonize(
-                    [ext],
-                    compiler_directives=compiler_directives,
-                    build_dir=build_temp_dir,
-                    nthreads=1,
-                    language_level=3,
-                    quiet=True,
-                    compile_time_env=False,
-                )
+                result = cythonize(pending, nthreads=batch_threads, **cython_kwargs)
+            compiled.extend(result)
+            break
+        except Exception as e:
+            # 首轮已重新生成全部正常模块的 .c（旧 .c 已在上面删除），重试与逐个编译不再强制
+            cython_kwargs["force"] = False
+            error_text = f"{stderr_capture.getvalue()}\n{e!r}"
+            bad_sources = _locate_failed_sources(error_text, pending)
+            if not bad_sources:
+                # 无法定位出错文件，剩余模块全部逐个编译
+                isolated.extend(pending)
+                break
+            isolated.extend(ext for ext in pending if ext.sources[0] in bad_sources)
+            pending = [ext for ext in pending if ext.sources[0] not in bad_sources]
+
+    if warmed_pool and pending:
+        title = "并行编译"
+        print(f"  - 子进程启动方式为 {multiprocessing.get_start_method()}，经预热进程池逐个编译 {len(pending)} 个模块...")
+        isolated = pending
+    elif not isolated:
+        print(f"  ✓ 批量编译完成: {len(compiled)} 个模块")
+    else:
+        title = "逐个编译"
+        print(f"  - 批量编译完成 {len(compiled)} 个模块，逐个编译 {len(isolated)} 个出错模块以定位错误...")
+
+    if isolated:
+        # 多进程逐个编译，记录错误信息（非 force 时已生成的 .c 文件会被 Cython 跳过）
+        outcomes = _cythonize_in_pool(isolated, cython_kwargs, nthreads, f"  - {title}:")
+        for src_file, result, error_msg in outcomes:
             if result:
                 compiled.extend(result)
-                print(f"{GREEN}✓{RESET}")
             else:
-                error_msg = stderr_capture.getvalue().strip()
-                print(f"{RED}X{RESET}")
-                failed[src_file] = error_msg or "未知编译错误"
-        except Exception as e:
-            full_error = f"{stderr_capture.getvalue().strip()}\n\nException: {repr(e)}"
-            print(f"{RED}X{RESET}\n{full_error}")
-            failed[src_file] = full_error
+                failed[src_file] = error_msg
+        succeeded = sum(1 for _, result, _ in outcomes if result)
+        print(f"\n  - {title}结束: 成功 {succeeded} 个，失败 {len(isolated) - succeeded} 个")
+
+    # 为本次新生成的 .c 文件记录编译指令指纹，供下次增量构建比对
+    for ext in fresh:
+        if ext.sources[0] not in failed:
+            stamp = _cython_c_path(ext.sources[0], build_temp_dir).with_suffix(".directives.sha1")
+            try:
+                stamp.write_text(directives_hash, encoding="ascii")
+            except OSError:
+                pass  # 指纹写入失败仅影响下次增量判断
+
+    # 将新生成的 .c 存入跨构建缓存（先写临时文件再改名，并发构建不会读到半个文件）
+    for ext in fresh:
+        key = cache_keys.get(ext.sources[0])
+        if key is None or ext.sources[0] in failed:
+            continue
+        cache_file = os.path.join(c_cache, key + ".c")
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            shutil.copyfile(_cython_c_path(ext.sources[0], build_temp_dir), tmp_file)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass  # 缓存写入失败不影响本次构建
 
     return compiled, failed
 
@@ -502,7 +1120,9 @@ def safe_cythonize(
 # ========================
 # 📂 辅助函数：将编译失败的 .py 文件原样复制
 # ========================
-def copy_failed_py_files(failed_files: List[str], dest_root: str, project_root: str):
+def copy_failed_py_files(
+    failed_files: List[str], dest_root: str, project_root: str, nthreads: int = 1
+):
     """
     将编译失败的 .py 文件直接复制到输出目录，避免功能丢失。
 
@@ -510,6 +1130,7 @@ def copy_failed_py_files(failed_files: List[str], dest_root: str, project_root:
         failed_files: 编译失败的源文件路径列表
         dest_root: 输出目录
         project_root: 项目根目录
+        nthreads: 编译线程数（用于确定复制线程池大小）
     """
     if not failed_files:
         return
@@ -519,38 +1140,527 @@ def copy_failed_py_files(failed_files: List[str], dest_root: str, project_root:
 
     print(f"\n{YELLOW}[COPY]{RESET} 正在复制 {len(failed_files)} 个编译失败的 .py 文件以便保留功能...")
 
-    copied = 0
+    # 扫描阶段记录的源文件路径均基于已 resolve 的项目根目录，无需逐个 resolve
+    pairs = []
     for src in failed_files:
         try:
-            src_path = Path(src).resolve()
+            src_path = Path(src)
             if not src_path.exists():
                 continue
-            rel_path = src_path.relative_to(proj)
-            target = dest / rel_path
-            target.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(src_path, target)
-            copied += 1
-            print(f"  ✓ 保留源码: {rel_path}")
+            pairs.append((src_path, dest / src_path.relative_to(proj)))
         except Exception as e:
             print(f"  X 复制失败 {src}: {e}")
 
-    print(f"  ✓ 已保留 {copied} 个未编译的 Python 文件")
+    copied = 0
+    progress = _Progress(len(pairs), "  - 进度:")
+    for src_path, error in _copy_files(pairs, nthreads):
+        progress.tick()
+        if error is not None:
+            print(f"\n  X 复制失败 {src_path}: {error}")
+            continue
+        copied += 1
+
+    print(f"\n  ✓ 已保留 {copied} 个未编译的 Python 文件")
+
+
+# ========================
+# 🔨 直接编译：并行调用 C 编译器生成 .so（POSIX）
+# ========================
+def _enable_ccache() -> bool:
+    """
+    若系统安装了 ccache 且用户未指定 CC / CXX，则以 ccache 包装默认编译器，
+    使未变更的翻译单元直接命中缓存（仅 POSIX 直接编译路径生效）。
+
+    Returns:
+        是否启用了 ccache
+    """
+    if os.name != "posix" or "CC" in os.environ or "CXX" in os.environ:
+        return False
+    if shutil.which("ccache") is None:
+        return False
+
+    cfg = sysconfig.get_config_vars()
+    os.environ["CC"] = f"ccache {cfg.get('CC') or 'cc'}"
+    os.environ["CXX"] = f"ccache {cfg.get('CXX') or 'c++'}"
+    return True
+
+
+def _posix_commands() -> Tuple[List[str], List[str]]:
+    """
+    按 distutils 的规则组装编译命令前缀（CC CFLAGS CCSHARED -I<Python头文件>）
+    与链接命令前缀（LDSHARED LDFLAGS）。
+    环境变量 CC / LDSHARED / CFLAGS / CPPFLAGS / LDFLAGS 的覆盖方式与 distutils 保持一致。
+
+    Returns:
+        (编译命令前缀, 链接命令前缀)
+    """
+    cfg = sysconfig.get_config_vars()
+    cfg_cc = cfg.get("CC") or "cc"
+    cc = os.environ.get("CC") or cfg_cc
+    ldshared = os.environ.get("LDSHARED") or cfg.get("LDSHARED") or f"{cfg_cc} -shared"
+    if "CC" in os.environ and "LDSHARED" not in os.environ and ldshared.startswith(cfg_cc):
+        ldshared = cc + ldshared[len(cfg_cc):]
+
+    # 错误输出会被捕获到报告中，关闭颜色转义（用户 CFLAGS / CPPFLAGS 在后，可覆盖）；
+    # 链接命令依次追加 LDFLAGS、CFLAGS、CPPFLAGS，与 distutils 的 customize_compiler 一致
+    env_cflags = [os.environ.get("CFLAGS"), os.environ.get("CPPFLAGS")]
+    cflags = [cfg.get("CFLAGS"), cfg.get("CCSHARED"), "-fdiagnostics-color=never"] + env_cflags
+    ldflags = [os.environ.get("LDFLAGS")] + env_cflags
+    paths = sysconfig.get_paths()
+    includes = dict.fromkeys([paths["include"], paths["platinclude"]])
+
+    compile_cmd = (
+        shlex.split(cc)
+        + shlex.split(" ".join(f for f in cflags if f))
+        + [f"-I{inc}" for inc in includes]
+    )
+    link_cmd = shlex.split(ldshared) + shlex.split(" ".join(f for f in ldflags if f))
+    return compile_cmd, link_cmd
+
+
+def _posix_size_flags() -> Tuple[List[str], List[str]]:
+    """
+    缩小 .so 体积的编译/链接参数：函数与数据各占一段，链接时剔除未引用的段并去除符号表。
+
+    Returns:
+        (额外编译参数, 额外链接参数)
+    """
+    if sys.platform == "darwin":
+        return ["-ffunction-sections", "-fdata-sections"], ["-Wl,-dead_strip"]
+    return ["-ffunction-sections", "-fdata-sections"], ["-Wl,--gc-sections", "-s"]
+
+
+def _optimize_flags(native: bool = True) -> Tuple[List[str], List[str]]:
+    """
+    优化级别与链接时优化（LTO）参数；native 时针对本机 CPU 指令集生成代码（产物不可移植）。
+
+    Returns:
+        (额外编译参数, 额外链接参数)
+    """
+    if os.name == "nt":
+        return ["/O2", "/GL"], ["/LTCG"]
+
+    compile_args = ["-O3", "-flto"]
+    link_args = ["-O3", "-flto"]
+    if sys.platform != "darwin":
+        compile_args.append("-fno-plt")
+        link_args.append("-Wl,-O1")
+    if native:
+        # Apple Silicon 上的 clang 使用 -mcpu 指定本机 CPU
+        arch_flag = "-mcpu=native" if sys.platform == "darwin" and os.uname().machine == "arm64" else "-march=native"
+        compile_args.append(arch_flag)
+        link_args.append(arch_flag)  # LTO 在链接阶段生成代码
+    return compile_args, link_args
+
+
+def _pgo_flags(stage: str, profile_dir: str) -> Tuple[List[str], List[str]]:
+    """
+    PGO 两阶段的编译/链接参数：generate 阶段插桩，use 阶段按采集的剖析数据优化。
+
+    Returns:
+        (额外编译参数, 额外链接参数)
+    """
+    if stage == "generate":
+        flags = [f"-fprofile-generate={profile_dir}"]
+        return flags, flags
+    return [f"-fprofile-use={profile_dir}", "-fprofile-correction"], [f"-fprofile-use={profile_dir}"]
+
+
+def run_pgo_training(train_cmd: str, build_lib_dir: str, profile_dir: str) -> bool:
+    """
+    运行训练命令采集剖析数据（构建输出目录加入 PYTHONPATH，可直接导入编译后的模块）。
+    Clang 生成的 .profraw 需经 llvm-profdata 合并为 default.profdata 才能用于第二阶段。
+
+    Returns:
+        是否成功采集到可用的剖析数据
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (build_lib_dir, env.get("PYTHONPATH")) if p)
+
+    print(f"\n{LIGHT_PURPLE}[PGO]{RESET} 运行训练命令: {train_cmd}")
+    try:
+        proc = subprocess.run(shlex.split(train_cmd), env=env)
+    except OSError as e:
+        print(f"  X 无法启动训练命令: {e}")
+        return False
+    if proc.returncode != 0:
+        print(f"  X 训练命令失败，退出码 {proc.returncode}")
+        return False
+
+    raw_profiles = [str(p) for p in Path(profile_dir).glob("*.profraw")]
+    if raw_profiles:
+        profdata = shutil.which("llvm-profdata")
+        if profdata is None:
+            print("  X 未找到 llvm-profdata，无法合并 Clang 剖析数据")
+            return False
+        error = _run_tool([profdata, "merge", "-o", os.path.join(profile_dir, "default.profdata")] + raw_profiles)
+        if error:
+            print(f"  X 合并剖析数据失败:\n{error}")
+            return False
+
+    print("  ✓ 已采集剖析数据")
+    return True
+
+
+def _run_tool(cmd: List[str]) -> str:
+    """运行编译/链接命令，返回错误信息（成功时为空字符串）。"""
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError as e:
+        return f"无法启动 C 编译器: {e}"
+    if proc.returncode != 0:
+        return (proc.stderr or proc.stdout).strip() or f"C 编译器退出码 {proc.returncode}"
+    return ""
+
+
+def _command_stamp(target: str) -> Path:
+    """命令指纹文件：与 .o 同目录（构建临时目录），如 a.o → a.o.sha1。"""
+    return Path(target + ".sha1")
+
+
+def _command_hash(cmd: List[str]) -> str:
+    """完整命令行（含 extra_*_args 与 define_macros）的 SHA1 指纹。"""
+    return hashlib.sha1("\0".join(cmd).encode("utf-8")).hexdigest()
+
+
+def _is_up_to_date(target: str, sources: List[str], stamp: Path, cmd: List[str]) -> bool:
+    """目标文件比全部输入新，且上次生成它的命令与本次完全相同时返回 True。"""
+    try:
+        target_mtime = os.stat(target).st_mtime
+        if any(os.stat(src).st_mtime > target_mtime for src in sources):
+            return False
+        return stamp.read_text(encoding="ascii") == _command_hash(cmd)
+    except OSError:
+        return False
+
+
+def _run_stamped(cmd: List[str], stamp: Path) -> str:
+    """
+    运行编译/链接命令，成功后写入命令指纹。
+    运行前先删除旧指纹，中途失败或中断时不会把残留产物误判为最新。
+
+    Returns:
+        错误信息（成功时为空字符串）
+    """
+    try:
+        stamp.unlink()
+    except OSError:
+        pass
+    error = _run_tool(cmd)
+    if not error:
+        stamp.write_text(_command_hash(cmd), encoding="ascii")
+    return error
+
+
+def _compile_objects(compile_cmd: List[str], ext: Extension, force: bool = False) -> Tuple[List[str], str]:
+    """
+    将扩展的各个 .c 文件编译为 .o（与 .c 同目录）；.o 比 .c 新且编译命令未变时跳过
+    （force 时总是重新编译）。
+
+    Returns:
+        (目标文件列表, 错误信息；成功时为空字符串)
+    """
+    cmd = list(compile_cmd)
+    cmd += [f"-I{inc}" for inc in ext.include_dirs]
+    cmd += [f"-D{name}" if value is None else f"-D{name}={value}" for name, value in ext.define_macros]
+    cmd += list(ext.extra_compile_args)
+
+    objects = []
+    for src in ext.sources:
+        obj = os.path.splitext(src)[0] + ".o"
+        obj_cmd = cmd + ["-c", src, "-o", obj]
+        stamp = _command_stamp(obj)
+        if force or not _is_up_to_date(obj, [src], stamp, obj_cmd):
+            error = _run_stamped(obj_cmd, stamp)
+            if error:
+                return objects, error
+        objects.append(obj)
+    return objects, ""
+
+
+def _link_command(link_cmd: List[str], exts: List[Extension], objects: List[str], out_file: Path) -> List[str]:
+    """组装链接命令：多个扩展的库目录、库与链接参数合并去重。"""
+    cmd = list(link_cmd) + objects
+    cmd += [f"-L{lib_dir}" for lib_dir in dict.fromkeys(d for ext in exts for d in ext.library_dirs)]
+    cmd += [f"-l{lib}" for lib in dict.fromkeys(lib for ext in exts for lib in ext.libraries)]
+    for args in dict.fromkeys(tuple(ext.extra_link_args) for ext in exts):
+        cmd += args
+    cmd += ["-o", str(out_file)]
+    return cmd
+
+
+def _link_stamp(ext: Extension) -> Path:
+    """单个扩展的链接命令指纹：存放在构建临时目录（.c 旁），不写入输出目录。"""
+    return _command_stamp(os.path.splitext(ext.sources[0])[0] + ".link")
+
+
+def _link_shared(cmd: List[str], out_file: Path, stamp: Optional[Path] = None) -> str:
+    """
+    执行链接命令生成共享库；给出 stamp 时成功后写入命令指纹。
+    先删除旧文件，避免链接器原地改写与之共享 inode 的硬链接（--onefile 输出）。
+
+    Returns:
+        错误信息（成功时为空字符串）
+    """
+    try:
+        out_file.unlink()
+    except OSError:
+        pass
+    if stamp is None:
+        return _run_tool(cmd)
+    return _run_stamped(cmd, stamp)
+
+
+def _compile_c_one(
+    commands: Tuple[List[str], List[str]], ext: Extension, out_file: Path, force: bool = False
+) -> Tuple[str, str]:
+    """
+    调用 C 编译器将单个扩展的 .c 文件编译为 .o（与 .c 同目录），再链接为 .so
+    （在线程池中运行，子进程期间释放 GIL）。编译与链接分开执行，ccache 才能缓存编译结果。
+
+    增量构建：.o / .so 比输入新且命令指纹一致时跳过；编译或链接参数变化
+    （--no-native、PGO 阶段切换等）会触发重新构建（force 时总是重新编译）。
+
+    Returns:
+        (模块名, 错误信息；成功或已是最新时为空字符串)
+    """
+    compile_cmd, link_cmd = commands
+    objects, error = _compile_objects(compile_cmd, ext, force)
+    if error:
+        return ext.name, error
+
+    cmd = _link_command(link_cmd, [ext], objects, out_file)
+    stamp = _link_stamp(ext)
+    if not force and _is_up_to_date(str(out_file), objects, stamp, cmd):
+        return ext.name, ""
+    return ext.name, _link_shared(cmd, out_file, stamp)
+
+
+def _build_onefile(
+    commands: Tuple[List[str], List[str]],
+    jobs: List[Tuple[Extension, Path]],
+    build_lib_dir: str,
+    nthreads: int,
+    force: bool = False,
+) -> Dict[str, str]:
+    """
+    合并链接模式：全部模块的 .o 链接进同一个共享库（位于输出目录下），再以硬链接放置到
+    各模块的输出路径；无法硬链接的模块改为逐个链接，不复制共享库。
+
+    Cython 生成的 C 代码仅导出 PyInit_<模块名> 与按完整模块名命名的全局变量，
+    只要模块名不重复即可共存于同一共享库；同名模块（如 a/config 与 b/config）依次分入
+    不同的共享库。链接次数由 N 次降为同名模块的最大重复数，同一共享库在导入时只加载一次。
+    合并链接失败时，该组模块回退为逐个链接。
+
+    Returns:
+        {模块名: 错误信息}，仅包含编译失败的模块
+    """
+    compile_cmd, link_cmd = commands
+    ext_suffix = sysconfig.get_config_var("EXT_SUFFIX")
+
+    failed = {}
+    objects: Dict[str, List[str]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, nthreads)) as executor:
+        futures = {executor.submit(_compile_objects, compile_cmd, ext, force): ext for ext, _ in jobs}
+        for future in as_completed(futures):
+            ext = futures[future]
+            objs, error = future.result()
+            if error:
+                print(f"  X 编译失败 {ext.name}:\n{error}")
+                failed[ext.name] = error
+            else:
+                objects[ext.name] = objs
+
+    # 按 PyInit 符号分组：第 k 个同名模块进入第 k 个共享库
+    bundles: List[List[Tuple[Extension, Path]]] = []
+    name_counts: Dict[str, int] = {}
+    for ext, out in jobs:
+        if ext.name in failed:
+            continue
+        leaf = ext.name.rpartition(".")[2]
+        k = name_counts.get(leaf, 0)
+        name_counts[leaf] = k + 1
+        if k == len(bundles):
+            bundles.append([])
+        bundles[k].append((ext, out))
+
+    def link_per_module(members: List[Tuple[Extension, Path]]) -> Dict[str, str]:
+        errors = {}
+        for ext, out in members:
+            error = _link_shared(_link_command(link_cmd, [ext], objects[ext.name], out), out, _link_stamp(ext))
+            if error:
+                errors[ext.name] = error
+        return errors
+
+    def link_bundle(idx: int, members: List[Tuple[Extension, Path]]) -> Dict[str, str]:
+        # 共享库放在输出目录下，保证与各模块输出同一文件系统，硬链接总能成功
+        bundle = Path(build_lib_dir, f"_pyshield_onefile{idx}{ext_suffix}")
+        exts = [ext for ext, _ in members]
+        cmd = _link_command(link_cmd, exts, [o for ext in exts for o in objects[ext.name]], bundle)
+        error = _link_shared(cmd, bundle)
+        if error:
+            print(f"  {YELLOW}[WARN]{RESET} 合并链接失败，{len(members)} 个模块回退为逐个链接:\n{error}")
+            return link_per_module(members)
+
+        # 不复制共享库（否则每个模块一份完整副本）：无法硬链接的模块改为逐个链接
+        unlinked = []
+        for ext, out in members:
+            try:
+                try:
+                    out.unlink()
+                except FileNotFoundError:
+                    pass
+                os.link(bundle, out)
+            except OSError:
+                unlinked.append((ext, out))
+                continue
+            # 输出已不再是逐个链接的产物，之后切回普通模式时须重新链接
+            try:
+                _link_stamp(ext).unlink()
+            except OSError:
+                pass
+        if unlinked:
+            print(f"  {YELLOW}[WARN]{RESET} {len(unlinked)} 个模块无法硬链接到合并的共享库，改为逐个链接")
+            if len(unlinked) == len(members):
+                bundle.unlink()
+        return link_per_module(unlinked)
+
+    print(f"  - 合并链接: {len(jobs) - len(failed)} 个模块 → {len(bundles)} 个共享库")
+    with ThreadPoolExecutor(max_workers=max(1, min(nthreads, len(bundles)))) as executor:
+        for errors in executor.map(link_bundle, range(len(bundles)), bundles):
+            for name, error in errors.items():
+                print(f"  X 链接失败 {name}:\n{error}")
+                failed[name] = error
+
+    return failed
+
+
+def _extension_output(build_lib_dir: str, name: str) -> Path:
+    """扩展模块的输出路径，与 build_ext 一致：<build_lib_dir>/<包路径>/<模块名><EXT_SUFFIX>。"""
+    *pkg_parts, mod_name = name.split(".")
+    return Path(build_lib_dir, *pkg_parts, mod_name + sysconfig.get_config_var("EXT_SUFFIX"))
+
+
+def remove_extension_outputs(names: List[str], build_lib_dir: str) -> None:
+    """删除输出目录中指定模块的 .so（如未完成优化构建的 PGO 插桩产物），不存在时忽略。"""
+    for name in names:
+        try:
+            _extension_output(build_lib_dir, name).unlink()
+        except OSError:
+            pass
+
+
+def build_extensions_direct(
+    cythonized_exts: List[Extension],
+    build_lib_dir: str,
+    nthreads: int,
+    force: bool = False,
+    onefile: bool = False,
+) -> Dict[str, str]:
+    """
+    不经过 setuptools.setup，直接以线程池并行调用 C 编译器构建扩展模块。
+    输出布局与 build_ext 一致：<build_lib_dir>/<包路径>/<模块名><EXT_SUFFIX>。
+
+    Args:
+        cythonized_exts: Cython 预处理后的扩展列表（sources 为 .c 文件）
+        build_lib_dir: 最终输出目录
+        nthreads: 并行编译线程数
+        force: 是否忽略已是最新的 .so，强制重新编译
+        onefile: 是否将全部模块合并链接为共享库（见 _build_onefile）
+
+    Returns:
+        {模块名: 错误信息}，仅包含编译失败的模块
+    """
+    commands = _posix_commands()
+    jobs = [(ext, _extension_output(build_lib_dir, ext.name)) for ext in cythonized_exts]
+
+    for parent in sorted({out.parent for _, out in jobs}, key=lambda p: len(p.parts)):
+        parent.mkdir(parents=True, exist_ok=True)
+
+    # 上次 --onefile 构建留下的合并共享库（本次需要时会重新链接）
+    for bundle in Path(build_lib_dir).glob("_pyshield_onefile*" + sysconfig.get_config_var("EXT_SUFFIX")):
+        bundle.unlink()
+
+    if onefile:
+        failed = _build_onefile(commands, jobs, build_lib_dir, nthreads, force)
+    else:
+        failed = {}
+        with ThreadPoolExecutor(max_workers=max(1, nthreads)) as executor:
+            futures = [executor.submit(_compile_c_one, commands, ext, out, force) for ext, out in jobs]
+            for future in as_completed(futures):
+                name, error = future.result()
+                if error:
+                    print(f"  X 编译失败 {name}:\n{error}")
+                    failed[name] = error
+
+    print(f"  ✓ 已构建 {len(jobs) - len(failed)}/{len(jobs)} 个扩展模块")
+    return failed
+
+
+def _capturing_spawn(compiler):
+    """
+    替换 distutils 编译器的 spawn：子进程（cl.exe / link.exe 等）的输出经 print 写入
+    当前 sys.stdout，随 setuptools 日志一同捕获（redirect_stdout 无法捕获子进程输出）。
+    MSVC 编译器的 PATH（_paths，在首次编译时初始化）与其原 spawn 保持一致。
+    """
+    try:
+        from setuptools.errors import ExecError
+    except ImportError:  # 未安装 setuptools 的旧环境（Python < 3.12）
+        from distutils.errors import DistutilsExecError as ExecError
+
+    def spawn(cmd, **kwargs):
+        env = kwargs.get("env")
+        paths = getattr(compiler, "_paths", None)
+        if env is None and paths:
+            env = dict(os.environ, PATH=paths)
+        executable = shutil.which(cmd[0], path=(env or os.environ).get("PATH"))
+        cmd = [executable or cmd[0], *cmd[1:]]
+        try:
+            proc = subprocess.run(
+                cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace"
+            )
+        except OSError as e:
+            raise ExecError(f"command {cmd[0]!r} failed: {e}") from e
+        if proc.stdout:
+            print(proc.stdout, end="")
+        if proc.returncode != 0:
+            raise ExecError(f"command {cmd[0]!r} failed with exit code {proc.returncode}")
+
+    return spawn
 
 
 # ========================
 # ⚙️ 主编译流程：调用 Cython + setuptools 构建
 # ========================
 def compile_with_cython(
-    extensions: List[Extension], build_lib_dir: str, build_temp_dir: str, nthreads: int
+    extensions: List[Extension],
+    build_lib_dir: str,
+    build_temp_dir: str,
+    nthreads: int,
+    force: bool = False,
+    onefile: bool = False,
+    native: bool = True,
+    pgo_flags: Optional[Tuple[List[str], List[str]]] = None,
+    shared_utility: bool = False,
+    c_cache: str = "",
+    annotate: bool = False,
 ) -> Tuple[List[Extension], Dict[str, str]]:
     """
-    使用 Cython 和 setuptools 编译扩展模块。
+    使用 Cython 编译扩展模块：POSIX 下直接并行调用 C 编译器，Windows 下交由 setuptools。
 
     Args:
         extensions: 待编译的扩展列表
         build_lib_dir: 最终输出目录（存放 .pyd/.so）
         build_temp_dir: 临时工作目录
         nthreads: 并行线程数（0 表示自动）
+        force: 是否忽略增量构建缓存，全部重新生成与编译
+        onefile: 是否将全部模块合并链接为共享库（仅 POSIX）
+        native: 是否针对本机 CPU 指令集优化（-march=native）
+        pgo_flags: PGO 当前阶段的额外编译/链接参数（见 _pgo_flags）；非 None 时
+            忽略 .so 增量缓存，保证插桩产物与优化产物都完整重建（仅 POSIX）
+        shared_utility: 是否将各模块公用的 Cython 运行时代码集中到共享工具模块（Cython 3.1+）
+        c_cache: 跨构建共享的 .c 缓存目录（空字符串表示不使用）
+        annotate: 是否生成 Cython HTML 注释报告（写入临时构建目录，仅供调试）
 
     Returns:
         (编译成功的扩展, 失败文件及其错误)
@@ -559,6 +1669,8 @@ def compile_with_cython(
         print(f"{YELLOW}[WARN]{RESET} 无模块需要编译，跳过 Cython 步骤。")
         return [], {}
 
+    import multiprocessing
+
     # 自动选择线程数
     actual_threads = multiprocessing.cpu_count() if nthreads == 0 else nthreads
     print(f"- 使用 {actual_threads} 个线程进行编译")
@@ -566,6 +1678,13 @@ def compile_with_cython(
     if actual_threads > 8:
         print(f"{YELLOW}提示：高线程数可能占用大量内存，若失败请减少线程数。{RESET}")
 
+    # POSIX 下统一使用 fork 启动子进程：cythonize 的进程池与逐个编译的回退进程池
+    # 直接继承已导入的 Cython，避免 macOS 默认 spawn 下每个子进程重新导入；
+    # 预处理结束后还原，不影响调用方（如在脚本中循环调用 main）
+    previous_start_method = multiprocessing.get_start_method(allow_none=True)
+    if os.name == "posix" and actual_threads > 1:
+        multiprocessing.set_start_method("fork", force=True)
+
     # Cython 编译器指令（性能优化）
     compiler_directives = {
         "language_level": 3,
@@ -575,23 +1694,101 @@ def compile_with_cython(
         "nonecheck": False,
         "cdivision": True,
         "infer_types": True,
-        "embedsignature": True,
     }
 
-    # 第一步：Cython 预处理（生成 .c 文件）
-    cythonized_exts, failed_dict = safe_cythonize(
-        extensions,
-        compiler_directives=compiler_directives,
-        build_temp_dir=build_temp_dir,
-    )
+    # 共享工具模块：每个模块少生成数十 KB 的运行时样板代码，编译更快、产物更小
+    shared_name = ""
+    if shared_utility:
+        import Cython
+
+        if tuple(int(x) for x in re.findall(r"\d+", Cython.__version__)[:2]) >= (3, 1):
+            shared_name = SHARED_UTILITY_MODULE
+            print(f"- 公用运行时代码集中到共享模块: {shared_name}")
+        else:
+            print(f"{YELLOW}[WARN]{RESET} --shared-utility 需要 Cython 3.1+（当前 {Cython.__version__}），已忽略。")
+
+    # 第一步：Cython 预处理（生成 .c 文件）；_apply_cython_options 修改的是进程级的
+    # Cython 全局选项，结束后还原，调用方之后的 cythonize 不受影响
+    from Cython.Compiler import Options
+
+    previous_options = {name: getattr(Options, name) for name in CYTHON_OPTIONS}
+    try:
+        cythonized_exts, failed_dict = safe_cythonize(
+            extensions,
+            compiler_directives=compiler_directives,
+            build_temp_dir=build_temp_dir,
+            nthreads=actual_threads,
+            force=force,
+            shared_utility=shared_name,
+            c_cache=c_cache,
+            annotate=annotate,
+        )
+    finally:
+        multiprocessing.set_start_method(previous_start_method, force=True)
+        for name, value in previous_options.items():
+            setattr(Options, name, value)
 
     if not cythonized_exts:
         print(f"{YELLOW}[WARN]{RESET} 所有模块均未通过 Cython 预处理，终止构建。")
         return [], failed_dict
 
-    # 第二步：调用 setuptools 构建原生扩展
+    # 第二步：构建原生扩展
     print(f"{LIGHT_PURPLE}[LINK]{RESET} 正在构建本地扩展模块 (.pyd/.so)...")
 
+    # 统一追加优化参数；POSIX 下另追加缩小体积的参数
+    extra_compile_args, extra_link_args = _optimize_flags(native)
+    if os.name == "posix":
+        size_compile_args, size_link_args = _posix_size_flags()
+        extra_compile_args += size_compile_args
+        extra_link_args += size_link_args
+        if pgo_flags is not None:
+            extra_compile_args += pgo_flags[0]
+            extra_link_args += pgo_flags[1]
+    # 以 python -O 运行本工具时，与解释器一致地去除 assert 语句
+    define_macros = list(CYTHON_MACROS)
+    if sys.flags.optimize:
+        define_macros.append(("CYTHON_WITHOUT_ASSERTIONS", "1"))
+
+    for ext in cythonized_exts:
+        ext.extra_compile_args = list(ext.extra_compile_args) + extra_compile_args
+        ext.extra_link_args = list(ext.extra_link_args) + extra_link_args
+        ext.define_macros = list(ext.define_macros) + define_macros
+
+    # POSIX：直接并行调用 C 编译器，编译失败的模块保留 .py 源码
+    if os.name == "posix":
+        c_failed = build_extensions_direct(
+            cythonized_exts,
+            build_lib_dir,
+            actual_threads,
+            force or pgo_flags is not None,
+            onefile,
+        )
+        if c_failed:
+            print("- 请确认已安装 C 编译器（如 GCC / Clang）")
+            src_by_name = {ext.name: ext.sources[0] for ext in extensions}
+            for name, error in c_failed.items():
+                failed_dict[src_by_name.get(name, name)] = error
+            cythonized_exts = [ext for ext in cythonized_exts if ext.name not in c_failed]
+        return cythonized_exts, failed_dict
+
+    # Windows：交由 setuptools 调用 MSVC（需其完成 vcvars 环境与 python 导入库的配置）
+    try:
+        from setuptools import setup
+        from setuptools.command.build_ext import build_ext
+    except ImportError:  # 未安装 setuptools 的旧环境（Python < 3.12），distutils 同样支持 --parallel
+        from distutils.command.build_ext import build_ext
+        from distutils.core import setup
+
+    class CapturedBuildExt(build_ext):
+        """编译器子进程的输出也写入 setup_log，与 setuptools 日志一起仅在失败时输出。"""
+
+        def build_extensions(self):
+            self.compiler.spawn = _capturing_spawn(self.compiler)
+            super().build_extensions()
+
+    if onefile:
+        print(f"{YELLOW}[WARN]{RESET} --onefile 仅支持 POSIX 平台，已按模块分别构建。")
+
     script_args = [
         "build_ext",
         f"--build-lib={build_lib_dir}",
@@ -601,14 +1798,21 @@ def compile_with_cython(
     # 添加并行编译标志（Windows用/m，Unix用-j）
     if actual_threads > 1:
         script_args.append(f"--parallel={actual_threads}")
+    if force:
+        script_args.append("--force")
 
+    # setuptools 的逐文件日志与编译器输出先写入内存，仅在失败时输出（构建出错时以 SystemExit 退出）
+    setup_log = io.StringIO()
     try:
-        setup(
-            name="compiled_project",
-            ext_modules=cythonized_exts,
-            script_args=script_args,
-        )
-    except Exception as e:
+        with redirect_stdout(setup_log):
+            setup(
+                name="compiled_project",
+                ext_modules=cythonized_exts,
+                script_args=script_args,
+                cmdclass={"build_ext": CapturedBuildExt},
+            )
+    except (Exception, SystemExit) as e:
+        print(setup_log.getvalue().rstrip())
         print(f"{RED}X 构建过程出错: {e}{RESET}")
         print("- 请确认已安装 C 编译器（如 MSVC / GCC / Clang）")
         return cythonized_exts, failed_dict
@@ -619,8 +1823,13 @@ def compile_with_cython(
 # ========================
 # 🎯 主函数：程序入口
 # ========================
-def main():
-    """主入口函数：解析参数 → 扫描 → 编译 → 复制辅助文件 → 输出结果"""
+def main(argv: Optional[List[str]] = None):
+    """
+    主入口函数：解析参数 → 扫描 → 编译 → 复制辅助文件 → 输出结果
+
+    Args:
+        argv: 命令行参数列表（默认读取 sys.argv），便于脚本中循环调用
+    """
     print(f"{CYAN}+++++ 当前版本：{VERSION} +++++{RESET}")
     print(f"{CYAN}+++++ 脚本作者：{AUTHOR} +++++{RESET}")
 
@@ -634,6 +1843,9 @@ def main():
         {YELLOW}参数说明:{RESET}
           -D DIRS        排除指定目录（但仍复制结构）
           -P FILES       排除指定 .py 文件（支持 *通配符）
+          --force        全部重新编译（默认复用输出目录/__temp__ 中未变更模块的结果）
+          --pgo CMD      剖析引导优化，如: --pgo "python -m myproj.bench"
+          -j NUM         并行编译数（-j 1 可关闭并行，用于并行构建异常的项目）
         """),
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
@@ -643,11 +1855,13 @@ def main():
     )
     parser.add_argument(
         "-t",
+        "-j",
         "--threads",
+        "--jobs",
         type=int,
         default=0,
         metavar="NUM",
-        help="并行编译线程数（0=自动检测所有核心，默认: 0）",
+        help="并行编译线程数（0=自动检测所有核心，1=关闭并行编译，默认: 0）",
     )
     parser.add_argument(
         "-D",
@@ -663,19 +1877,78 @@ def main():
         metavar="FILE",
         help="逗号分隔的 .py 文件路径（支持 '*filename.py' 通配）",
     )
+    parser.add_argument(
+        "--force",
+        dest="force",
+        action="store_true",
+        default=os.environ.get("CYTHON_FORCE_REGEN") == "1",
+        help="忽略增量构建缓存，全部重新生成 .c 并编译（也可设置环境变量 CYTHON_FORCE_REGEN=1）",
+    )
+    parser.add_argument(
+        "--no-force",
+        dest="force",
+        action="store_false",
+        help="复用未变更模块的 .c 与 .so（默认）",
+    )
+    parser.add_argument(
+        "--link-excluded",
+        action="store_true",
+        help="排除目录（-D）与输出目录位于同一文件系统时以硬链接代替复制（输出与源码共享文件）",
+    )
+    parser.add_argument(
+        "--onefile",
+        action="store_true",
+        help="将全部模块合并链接为一个共享库（输出目录下的 _pyshield_onefile*），各模块路径为其硬链接；"
+        "打包为 zip / wheel 时硬链接会展开为多份副本（仅 POSIX）",
+    )
+    parser.add_argument(
+        "--shared-utility",
+        action="store_true",
+        help=f"各模块公用的 Cython 运行时代码集中到 {SHARED_UTILITY_MODULE} 模块（需 Cython 3.1+）",
+    )
+    parser.add_argument(
+        "--no-native",
+        dest="native",
+        action="store_false",
+        help="不针对本机 CPU 优化（-march=native），产物需在其他机器上运行时使用；"
+        "与上次构建的设置不同时，受影响的 .o/.so 会自动重新编译",
+    )
+    parser.add_argument(
+        "--pgo",
+        default="",
+        metavar="TRAIN_CMD",
+        help="剖析引导优化：先插桩构建，运行训练命令采集数据后再优化构建（仅 POSIX）",
+    )
+    parser.add_argument(
+        "--tmpfs",
+        action="store_true",
+        help=f"临时文件写入 {TMPFS_DIR}（内存文件系统）并在结束时删除，不保留增量缓存",
+    )
+    parser.add_argument(
+        "--c-cache",
+        default="",
+        metavar="DIR",
+        help="按源文件内容缓存 Cython 生成的 .c 文件，可在多次构建 / CI 任务间共享；"
+        ".c 内嵌源文件路径，仅检出目录与工作目录相同的构建会命中缓存",
+    )
+    parser.add_argument(
+        "--annotate",
+        action="store_true",
+        help="生成 Cython HTML 注释报告（位于临时构建目录的 .c 文件旁，仅供开发调试）",
+    )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # --- 2. 初始化变量 ---
     PROJECT_ROOT = args.project_path
     OUTPUT_DIR = args.output
     THREADS = args.threads
-    exclude_dirs_list = [d.strip() for d in args.exclude_dir.split(",") if d.strip()]
-    exclude_py_list = [f.strip() for f in args.exclude_py.split(",") if f.strip()]
+    exclude_dirs = frozenset(d.strip() for d in args.exclude_dir.split(",") if d.strip())
+    exclude_py = frozenset(f.strip() for f in args.exclude_py.split(",") if f.strip())
 
-    # 合并排除规则
-    exclude_dirs_set = set(exclude_dirs_list) | EXCLUDE_DIRS
-    exclude_py_set = set(exclude_py_list)
+    # 合并排除规则，并预先解析 .py 排除模式
+    exclude_dirs_set = exclude_dirs | EXCLUDE_DIRS
+    exclude_py_exact, exclude_py_wild_basenames, _ = _compile_exclude(exclude_py)
 
     # --- 3. 验证输入路径 ---
     project_path = Path(PROJECT_ROOT)
@@ -683,54 +1956,142 @@ def main():
         print(f"{RED}X 错误：项目路径 '{PROJECT_ROOT}' 不存在或不是目录。{RESET}")
         sys.exit(1)
 
-    # --- 4. 创建构建目录 ---
-    BUILD_DIR = Path(OUTPUT_DIR).resolve()
-    PROJECT_NAME = project_path.name
-    BUILD_LIB_DIR = BUILD_DIR / PROJECT_NAME
-    BUILD_TEMP_DIR = BUILD_DIR / "__temp__"
+    # 在脚本中循环调用 main() 时，本次设置的进程级状态（CC/CXX、内存临时目录）须在返回前还原
+    saved_env = {name: os.environ.get(name) for name in ("CC", "CXX")}
+    tmpfs_dir = None
+    try:
+        # --- 4. 创建构建目录 ---
+        BUILD_DIR = Path(OUTPUT_DIR).resolve()
+        PROJECT_NAME = project_path.name
+        BUILD_LIB_DIR = BUILD_DIR / PROJECT_NAME
+        BUILD_TEMP_DIR = BUILD_DIR / "__temp__"
+
+        # 临时文件放到内存文件系统：生成的 .c 与 .o 不落盘，退出时删除（不保留增量缓存）
+        if args.tmpfs:
+            try:
+                tmpfs_free = shutil.disk_usage(TMPFS_DIR).free
+            except OSError:
+                tmpfs_free = 0
+            if tmpfs_free >= TMPFS_MIN_FREE:
+                BUILD_TEMP_DIR = tmpfs_dir = Path(tempfile.mkdtemp(prefix="pyshield-", dir=TMPFS_DIR))
+            else:
+                print(f"{YELLOW}[WARN]{RESET} {TMPFS_DIR} 不存在或可用空间不足 2 GiB，临时文件仍写入输出目录。")
 
-    BUILD_LIB_DIR.mkdir(parents=True, exist_ok=True)
-    BUILD_TEMP_DIR.mkdir(parents=True, exist_ok=True)
+        BUILD_LIB_DIR.mkdir(parents=True, exist_ok=True)
+        BUILD_TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
-    print(f"- 项目: {PROJECT_ROOT}")
-    print(f"- 输出目录: {BUILD_LIB_DIR}")
+        # 后续各步骤反复使用的字符串路径，只转换一次
+        build_lib_str = str(BUILD_LIB_DIR)
+        build_temp_str = str(BUILD_TEMP_DIR)
 
-    # --- 5. 收集模块 ---
-    extensions, _ = collect_extensions_and_packages(
-        PROJECT_ROOT, exclude_dirs_set, exclude_py_set
-    )
+        print(f"- 项目: {PROJECT_ROOT}")
+        print(f"- 输出目录: {BUILD_LIB_DIR}")
+        if args.tmpfs:
+            print(f"- 临时目录: {BUILD_TEMP_DIR}")
 
-    # --- 6. 执行编译 ---
-    _, failed_dict = compile_with_cython(
-        extensions, str(BUILD_LIB_DIR), str(BUILD_TEMP_DIR), THREADS
-    )
+        if _enable_ccache():
+            print(f"- 检测到 ccache，C 编译器: {os.environ['CC']}")
 
-    # --- 7. 复制各类辅助文件 ---
-    copy_non_python_files(PROJECT_ROOT, str(BUILD_LIB_DIR), exclude_dirs_set)
-    copy_init_py_files(PROJECT_ROOT, str(BUILD_LIB_DIR), exclude_dirs_set)
-    copy_excluded_directories(PROJECT_ROOT, str(BUILD_LIB_DIR), exclude_dirs_list)
-    copy_excluded_python_files(PROJECT_ROOT, str(BUILD_LIB_DIR), exclude_py_list)
-    copy_failed_py_files(list(failed_dict.keys()), str(BUILD_LIB_DIR), PROJECT_ROOT)
+        # --- 5. 扫描项目（模块、__init__.py、资源文件一次收集） ---
+        extensions, _, init_files, resource_files = scan_project(
+            PROJECT_ROOT, exclude_dirs_set, exclude_py_exact, exclude_py_wild_basenames
+        )
 
-    # --- 8. 输出最终状态 ---
-    used_threads = THREADS if THREADS > 0 else multiprocessing.cpu_count()
-    print(f"- 提示：共使用 {used_threads} 个线程完成编译")
+        # --- 6. 执行编译（--pgo 时为插桩构建，清空上次的剖析数据） ---
+        pgo_dir = str(BUILD_TEMP_DIR / "_pgo")
+        pgo_flags = None
+        if args.pgo and os.name != "posix":
+            print(f"{YELLOW}[WARN]{RESET} --pgo 仅支持 POSIX 平台（GCC / Clang），已忽略。")
+        elif args.pgo:
+            shutil.rmtree(pgo_dir, ignore_errors=True)
+            pgo_flags = _pgo_flags("generate", pgo_dir)
+
+        built_exts, failed_dict = compile_with_cython(
+            extensions,
+            build_lib_str,
+            build_temp_str,
+            THREADS,
+            force=args.force,
+            onefile=args.onefile,
+            native=args.native,
+            pgo_flags=pgo_flags,
+            shared_utility=args.shared_utility,
+            c_cache=args.c_cache,
+            annotate=args.annotate,
+        )
 
-    if failed_dict:
-        print(
-            f"{YELLOW}[WARN] 注意：以下文件因编译错误未转为二进制，已保留为 .py 源码：{RESET}"
+        # --- 7. 复制各类辅助文件 ---
+        used_threads = THREADS if THREADS > 0 else (os.cpu_count() or 1)
+        copy_non_python_files(resource_files, build_lib_str, used_threads)
+        copy_init_py_files(init_files, build_lib_str, used_threads)
+        copy_excluded_directories(
+            PROJECT_ROOT, build_lib_str, exclude_dirs, used_threads, args.link_excluded
         )
-        for src, err in failed_dict.items():
-            rel_f = os.path.relpath(src, PROJECT_ROOT)
-            print(f"    - {rel_f}")
-            if err.strip():
-                lines = [f"        {RED}{line}{RESET}" for line in err.splitlines()]
-                print("\n" + "\n".join(lines) + "\n")
-        print(f"{YELLOW}💡 建议修复语法/Cython兼容性问题后重新编译。{RESET}")
-    else:
-        print(f"\n{GREEN}[SUCCESS] 所有模块均已成功编译为 .pyd/.so 文件！{RESET}")
+        copy_excluded_python_files(
+            PROJECT_ROOT, build_lib_str, exclude_py, exclude_dirs_set, used_threads
+        )
+        copy_failed_py_files(
+            list(failed_dict.keys()), build_lib_str, PROJECT_ROOT, used_threads
+        )
+
+        # PGO 第二阶段：训练后按剖析数据重新构建；训练失败时去除插桩重新构建
+        if pgo_flags is not None:
+            rebuilt_exts = None
+            try:
+                trained = run_pgo_training(args.pgo, build_lib_str, pgo_dir)
+                print(f"{LIGHT_PURPLE}[PGO]{RESET} {'按剖析数据优化' if trained else '去除插桩'}，重新构建...")
+                rebuilt_exts, pgo_failed = compile_with_cython(
+                    [ext for ext in extensions if ext.sources[0] not in failed_dict],
+                    build_lib_str,
+                    build_temp_str,
+                    THREADS,
+                    onefile=args.onefile,
+                    native=args.native,
+                    pgo_flags=_pgo_flags("use", pgo_dir) if trained else ([], []),
+                    shared_utility=args.shared_utility,
+                    c_cache=args.c_cache,
+                )
+            finally:
+                # 第二阶段未完成（中断或异常）时，插桩产物不得留在输出目录
+                if rebuilt_exts is None:
+                    remove_extension_outputs([ext.name for ext in built_exts], build_lib_str)
+
+            # 第二阶段失败的模块回退为 .py，同时删除其残留的插桩 .so（否则导入时优先加载 .so）
+            rebuilt_names = {ext.name for ext in rebuilt_exts}
+            remove_extension_outputs(
+                [ext.name for ext in built_exts if ext.name not in rebuilt_names], build_lib_str
+            )
+            copy_failed_py_files(
+                list(pgo_failed.keys()), build_lib_str, PROJECT_ROOT, used_threads
+            )
+            failed_dict.update(pgo_failed)
+
+        # --- 8. 输出最终状态 ---
+        print(f"- 提示：共使用 {used_threads} 个线程完成编译")
+
+        if failed_dict:
+            print(
+                f"{YELLOW}[WARN] 注意：以下文件因编译错误未转为二进制，已保留为 .py 源码：{RESET}"
+            )
+            for src, err in failed_dict.items():
+                rel_f = os.path.relpath(src, PROJECT_ROOT)
+                print(f"    - {rel_f}")
+                if err.strip():
+                    lines = [f"        {RED}{line}{RESET}" for line in err.splitlines()]
+                    print("\n" + "\n".join(lines) + "\n")
+            print(f"{YELLOW}💡 建议修复语法/Cython兼容性问题后重新编译。{RESET}")
+        else:
+            print(f"\n{GREEN}[SUCCESS] 所有模块均已成功编译为 .pyd/.so 文件！{RESET}")
 
-    print(f"\n{GREEN}✓ 编译完成！输出目录: {BUILD_LIB_DIR.resolve()}{RESET}")
+        print(f"\n{GREEN}✓ 编译完成！输出目录: {BUILD_LIB_DIR}{RESET}")
+    finally:
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        if tmpfs_dir is not None:
+            shutil.rmtree(tmpfs_dir, ignore_errors=True)
 
 
 # ========================